@@ -1,29 +1,130 @@
 import sys
 
 class AnomalyLevel(object):
-    def __init__(self, level):
+    def __init__(self, level, severity):
         self.level = level
+        self.severity = severity
 
     def __str__(self):
-        return level
+        return self.level
+
+# Levels in increasing order of severity
+LEVELS = []
 
 module = sys.modules[__name__]
-for level in ['INFO', 'UNUSUAL', 'CORRUPTION']:
-    setattr(module, level, AnomalyLevel(level))
+for severity, level in enumerate(['INFO', 'UNUSUAL', 'CORRUPTION']):
+    anomaly_level = AnomalyLevel(level, severity)
+    setattr(module, level, anomaly_level)
+    LEVELS.append(anomaly_level)
 
 
 class Anomaly(object):
-    def __init__(self, container, level, details):
+    def __init__(self, container, level, details, args=()):
         """Record of an anomaly found during disk processing.
-        
+
+        The details string is only formatted when it is first read.
+
         Args:
             container: object that contains the anomaly
             level: AnomalyLevel
-            details: string description of anomaly (str)
+            details: string description of anomaly, or format string if args are given (str)
+            args: values to format into details (tuple)
         """
         self.container = container
         self.level = level
-        self.details = details
+        self._details = details
+        self._args = args
+
+    @property
+    def details(self):
+        if self._args:
+            self._details = self._details % self._args
+            self._args = ()
+        return self._details
 
     def __str__(self):
-        return '%s anomaly in %s: %s' % (self.level, self.container, self.details)
\ No newline at end of file
+        return '%s anomaly in %s: %s' % (self.level, self.container, self.details)
+
+
+class AnomalySink(object):
+    def __init__(self, min_level=INFO, max_per_disk=None):
+        """Central collection point for anomalies.
+
+        Every anomaly is counted, but only those at or above min_level are kept, and at most
+        max_per_disk of those are kept for each disk.  The per-disk count is held on the disk that
+        owns the reporting container (see Container.OwningDisk); anomalies from containers not
+        attached to a disk are not limited.  Anomalies that are not kept are never constructed or
+        formatted.
+
+        Args:
+            min_level: least severe AnomalyLevel to keep
+            max_per_disk: maximum number of anomalies to keep per disk, or None for no limit (int)
+        """
+        self.min_level = min_level
+        self.max_per_disk = max_per_disk
+
+        # Maps AnomalyLevel to number of anomalies reported, including ones that were not kept
+        self.counts = dict((level, 0) for level in LEVELS)
+        # Maps AnomalyLevel to number of anomalies kept
+        self.kept = dict((level, 0) for level in LEVELS)
+        # Number of anomalies not kept because the per-disk limit was reached
+        self.dropped = 0
+
+    def Record(self, container, level, details, *args):
+        """Report an anomaly.
+
+        Returns:
+            the new Anomaly if it was kept, otherwise None
+        """
+        self.counts[level] += 1
+        if level.severity < self.min_level.severity:
+            return None
+        if self.max_per_disk is not None:
+            disk = container.OwningDisk()
+            if disk is not None:
+                if disk.anomaly_count >= self.max_per_disk:
+                    self.dropped += 1
+                    return None
+                disk.anomaly_count += 1
+
+        self.kept[level] += 1
+        return Anomaly(container, level, details, args)
+
+    def Count(self, min_level=INFO):
+        """Number of anomalies reported at or above min_level, including ones that were not kept."""
+        return sum(count for level, count in self.counts.iteritems() if level.severity >= min_level.severity)
+
+    def Summary(self):
+        """Generate a summary line for each level, most severe first."""
+        for level in reversed(LEVELS):
+            yield '%s: %d reported, %d kept' % (level, self.counts[level], self.kept[level])
+        if self.dropped:
+            yield '%d anomalies dropped over the per-disk limit of %d' % (self.dropped, self.max_per_disk)
+
+# Sink that all containers report anomalies to, replaced by SetSink
+sink = AnomalySink()
+
+def SetSink(new_sink):
+    """Replace the sink that anomalies are reported to, returning the previous one."""
+    global sink
+    old_sink = sink
+    sink = new_sink
+    return old_sink
+
+
+def AnomaliesByLevel(container, min_level=INFO):
+    """Generate the anomalies of a container and all its descendants at or above min_level, most severe first."""
+    by_level = dict((level, []) for level in LEVELS)
+
+    def collect(c):
+        for a in c.anomalies:
+            by_level[a.level].append(a)
+
+    collect(container)
+    container.Recurse(collect)
+
+    for level in reversed(LEVELS):
+        if level.severity < min_level.severity:
+            break
+        for a in by_level[level]:
+            yield a
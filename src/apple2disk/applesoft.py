@@ -113,8 +113,8 @@ TOKENS = {
 }
 
 class AppleSoft(container.Container):
-    def __init__(self, filename, data):
-        super(AppleSoft, self).__init__()
+    def __init__(self, filename, data, disk=None):
+        super(AppleSoft, self).__init__(disk=disk)
 
         self.filename = filename
         data = bitstring.ConstBitStream(data)
@@ -145,27 +145,23 @@ class AppleSoft(container.Container):
                     try:
                         line.append(' ' + TOKENS[token] + ' ')
                     except KeyError:
-                        self.anomalies.append(anomaly.Anomaly(
-                            self, anomaly.CORRUPTION, 'Line number %d contains unexpected token: %02X' % (
-                                line_number, token)
-                            )
+                        self.AddAnomaly(
+                            anomaly.CORRUPTION, 'Line number %d contains unexpected token: %02X',
+                            line_number, token
                         )
                 else:
                     line.append(chr(token))
 
             if last_memory + bytes_read != next_memory:
-                self.anomalies.append(anomaly.Anomaly(
-                    self, anomaly.UNUSUAL, "%x + %x == %x != %x (gap %d)" % (
-                        last_memory, bytes_read, last_memory + bytes_read, next_memory,
-                        next_memory - last_memory - bytes_read)
-                    )
+                self.AddAnomaly(
+                    anomaly.UNUSUAL, "%x + %x == %x != %x (gap %d)",
+                    last_memory, bytes_read, last_memory + bytes_read, next_memory,
+                    next_memory - last_memory - bytes_read
                 )
 
             if line_number <= last_line_number:
-                self.anomalies.append(anomaly.Anomaly(
-                    self, anomaly.UNUSUAL, "%d <= %d: %s" % (
-                        line_number, last_line_number, ''.join(line))
-                    )
+                self.AddAnomaly(
+                    anomaly.UNUSUAL, "%d <= %d: %s", line_number, last_line_number, ''.join(line)
                 )
 
             last_line_number = line_number
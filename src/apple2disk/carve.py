@@ -0,0 +1,167 @@
+import anomaly
+import container
+import disk as disklib
+import dos33disk
+
+import bitstring
+import struct
+
+# Number of track/sector pairs in a T/S list sector, and offset of the first one
+TS_PAIRS = 122
+TS_PAIRS_OFFSET = 0x0c
+
+# A file can't have more data sectors than there are on the disk
+MAX_SECTOR_OFFSET = disklib.TRACKS_PER_DISK * disklib.SECTORS_PER_TRACK
+
+
+def IsTrackSectorList(data):
+    """Check whether the contents of a sector are shaped like a DOS 3.3 T/S list sector.
+
+    The cheapest tests come first, since most sectors on a disk fail them.
+
+    Args:
+        data: sector contents (bytearray)
+    """
+    # Bytes 0x03-0x0b are unused apart from the sector offset at 0x05
+    if any(data[0x03:0x05]) or any(data[0x07:TS_PAIRS_OFFSET]):
+        return False
+    (next_track, next_sector, sector_offset) = struct.unpack('<xBBxxH', str(data[0x00:0x07]))
+    if next_track >= disklib.TRACKS_PER_DISK or next_sector >= disklib.SECTORS_PER_TRACK:
+        return False
+    if not next_track and next_sector:
+        return False
+    if sector_offset % TS_PAIRS or sector_offset >= MAX_SECTOR_OFFSET:
+        return False
+
+    pairs = data[TS_PAIRS_OFFSET:]
+    tracks = pairs[0::2]
+    sectors = pairs[1::2]
+    if max(tracks) >= disklib.TRACKS_PER_DISK or max(sectors) >= disklib.SECTORS_PER_TRACK:
+        return False
+    # Need at least one data sector, and DOS 3.3 never allocates file sectors in track 0
+    if not any(tracks):
+        return False
+    for (track, sector) in zip(tracks, sectors):
+        if not track and sector:
+            return False
+    return True
+
+
+def CandidateSectors(disk):
+    """Enumerate sectors that don't belong to any parsed structure on a fully parsed disk."""
+    for (track, sector) in disk.EnumerateSectors():
+        if type(disk.sectors[(track, sector)]) in (disklib.Sector, dos33disk.FreeSector):
+            yield (track, sector)
+
+
+class RecoveredFile(container.Container):
+    def __init__(self, disk, ts_list_sectors, catalog_entry=None):
+        """A deleted or orphaned file rebuilt from its T/S list sectors.
+
+        Args:
+            disk: disk the file was recovered from (dos33disk.Dos33Disk)
+            ts_list_sectors: list of (track, sector) of T/S list sectors in chain order
+            catalog_entry: deleted CatalogEntry for the file, or None for an orphaned T/S list
+        """
+        super(RecoveredFile, self).__init__(disk=disk)
+
+        self.ts_list_sectors = ts_list_sectors
+        self.catalog_entry = catalog_entry
+
+        data_sectors = []
+        for (track, sector) in ts_list_sectors:
+            data = bytearray(disk.SectorData(track, sector))
+            (sector_offset,) = struct.unpack('<H', str(data[0x05:0x07]))
+            pairs = data[TS_PAIRS_OFFSET:]
+            if len(data_sectors) < sector_offset:
+                data_sectors.extend([None] * (sector_offset - len(data_sectors)))
+            data_sectors[sector_offset:sector_offset + TS_PAIRS] = zip(pairs[0::2], pairs[1::2])
+
+        # Trim trailing unused entries
+        while data_sectors and not (data_sectors[-1] and data_sectors[-1][0]):
+            data_sectors.pop()
+
+        self.data_sectors = []
+        contents = bitstring.BitString()
+        for ts in data_sectors:
+            if not (ts and ts[0]):
+                # Sparse file, or T/S list sectors missing from the chain
+                contents.append(bitstring.Bits(bytes=bytearray(disklib.SECTOR_SIZE)))
+                continue
+            self.data_sectors.append(ts)
+            owner = disk.sectors.get(ts)
+            if owner is not None and type(owner) not in (disklib.Sector, dos33disk.FreeSector):
+                self.AddAnomaly(
+                    anomaly.UNUSUAL, 'Data sector T$%02X S$%02X is now in use: %s', ts[0], ts[1], owner
+                )
+            contents.append(bitstring.Bits(bytes=disk.SectorData(*ts)))
+        self.contents = contents
+
+    def Name(self):
+        if self.catalog_entry:
+            # Last character of the name was overwritten by the original track
+            return self.catalog_entry.FileName()[:-1].rstrip()
+        (track, sector) = self.ts_list_sectors[0]
+        return 'ORPHAN.T%02X.S%02X' % (track, sector)
+
+    def __str__(self):
+        return 'RecoveredFile(%s)' % self.Name()
+
+
+def CarveFiles(disk):
+    """Recover deleted and orphaned files from sectors not owned by any parsed structure.
+
+    Candidate sectors are checked for T/S list structure, then chained together through their
+    next pointers.  Chains whose first T/S list is referenced by a deleted catalog entry are
+    named after it, the rest are reported as orphans.
+
+    The result is cached on the disk, so later calls return the same files.
+
+    Args:
+        disk: fully parsed disk (dos33disk.Dos33Disk)
+
+    Returns:
+        list of RecoveredFile
+
+    Raises:
+        disk.IOError: if the disk was opened without preloading, e.g. by Dos33Disk.OpenCatalog
+    """
+    if not disk.preload:
+        # Unread sectors have no owner yet, so live files would look like orphans
+        raise disklib.IOError('Cannot carve files from partially parsed disk %s' % disk.name)
+
+    if disk.recovered_files is not None:
+        return disk.recovered_files
+
+    ts_lists = {}
+    for (track, sector) in CandidateSectors(disk):
+        data = bytearray(disk.SectorData(track, sector))
+        if IsTrackSectorList(data):
+            ts_lists[(track, sector)] = (data[0x01], data[0x02])
+
+    # Sectors that are the continuation of another T/S list can't start a file
+    continuations = set(ts_lists.itervalues())
+
+    deleted_entries = {}
+    for catalog_entry in disk.catalog.itervalues():
+        if catalog_entry.deleted:
+            deleted_entries[(catalog_entry.original_track, catalog_entry.sector)] = catalog_entry
+
+    recovered = []
+    for start in sorted(ts_lists):
+        catalog_entry = deleted_entries.get(start)
+        if start in continuations and not catalog_entry:
+            continue
+
+        chain = []
+        ts = start
+        while ts in ts_lists and ts not in chain:
+            chain.append(ts)
+            ts = ts_lists[ts]
+
+        recovered_file = RecoveredFile(disk, chain, catalog_entry)
+        disk.AddChild(recovered_file)
+        recovered.append(recovered_file)
+
+    disk.recovered_files = recovered
+    return recovered
@@ -1,8 +1,16 @@
+import anomaly
+
 class Container(object):
     """Generic container type, every structure on the disk extends from this."""
 
-    def __init__(self):
+    def __init__(self, disk=None):
+        """
+        Args:
+            disk: disk this container belongs to, for containers that report anomalies before
+                they are attached to it with AddChild (disk.Disk)
+        """
         self.anomalies = []
+        self.disk = disk
 
         self.parent = None
         self.children = []
@@ -18,3 +26,23 @@ class Container(object):
         for child in self.children:
             callback(child)
             child.Recurse(callback)
+
+    def OwningDisk(self):
+        """Return the disk this container belongs to, or None if it isn't attached to one."""
+        container = self
+        while container is not None:
+            if container.disk is not None:
+                return container.disk
+            container = container.parent
+        return None
+
+    def AddAnomaly(self, level, details, *args):
+        """Report an anomaly in this container to anomaly.sink, keeping it if the sink accepts it.
+
+        Args:
+            level: anomaly.AnomalyLevel
+            details: format string describing the anomaly, only formatted with args if it is read
+        """
+        new_anomaly = anomaly.sink.Record(self, level, details, *args)
+        if new_anomaly:
+            self.anomalies.append(new_anomaly)
@@ -0,0 +1,130 @@
+import disk as disklib
+import dos33disk
+import utils
+
+import cStringIO
+import hashlib
+import sys
+
+
+def SectorHashes(disk):
+    """Return a list of sha1 digests of each sector of a disk, in logical track/sector order."""
+    return [
+        hashlib.sha1(disk.SectorData(track, sector)).digest()
+        for (track, sector) in disk.EnumerateSectors()
+    ]
+
+
+def SectorOwner(disk, track, sector):
+    """Describe what a sector belongs to, e.g. VTOC, catalog or a named file."""
+    try:
+        return disk.sectors[(track, sector)].TYPE
+    except KeyError:
+        # Not read by a partial parse
+        return 'Unread sector'
+
+
+class SectorDiff(object):
+    def __init__(self, track, sector, owner_a, owner_b, data_a, data_b):
+        """Record of a sector that differs between two disks.
+
+        Args:
+            track: track number (int)
+            sector: sector number (int)
+            owner_a: description of sector owner in first disk (str)
+            owner_b: description of sector owner in second disk (str)
+            data_a: sector contents in first disk (bytearray)
+            data_b: sector contents in second disk (bytearray)
+        """
+        self.track = track
+        self.sector = sector
+        self.owner_a = owner_a
+        self.owner_b = owner_b
+        self.data_a = data_a
+        self.data_b = data_b
+
+    def DifferingBytes(self):
+        return sum(1 for (a, b) in zip(self.data_a, self.data_b) if a != b)
+
+    def Render(self, out):
+        """Write a hex diff of the lines of this sector that differ to a file-like object."""
+        out.write('%s\n' % self)
+        for offset in xrange(0, disklib.SECTOR_SIZE, utils.BYTES_PER_LINE):
+            line_a = self.data_a[offset:offset + utils.BYTES_PER_LINE]
+            line_b = self.data_b[offset:offset + utils.BYTES_PER_LINE]
+            if line_a == line_b:
+                continue
+            markers = ' '.join('^^' if a != b else '  ' for (a, b) in zip(line_a, line_b))
+            out.write('- %s\n' % utils.FormatHexLine(offset, line_a))
+            out.write('+ %s\n' % utils.FormatHexLine(offset, line_b))
+            out.write('         %s\n' % markers.rstrip())
+
+    def __str__(self):
+        if self.owner_a == self.owner_b:
+            owner = self.owner_a
+        else:
+            owner = '%s / %s' % (self.owner_a, self.owner_b)
+        return 'Track $%02x Sector $%02x: %s (%d bytes differ)' % (
+            self.track, self.sector, owner, self.DifferingBytes())
+
+
+class DiskDiff(object):
+    def __init__(self, disk_a, disk_b, hashes_a=None, hashes_b=None):
+        """Sector-level comparison of two disks.
+
+        Sectors are compared by hash so that identical sectors are skipped without
+        looking at their contents.
+
+        Args:
+            disk_a: first disk (disk.Disk)
+            disk_b: second disk (disk.Disk)
+            hashes_a: previously computed SectorHashes() of disk_a, if available
+            hashes_b: previously computed SectorHashes() of disk_b, if available
+        """
+        self.disk_a = disk_a
+        self.disk_b = disk_b
+
+        self.differences = []
+        if disk_a.hash == disk_b.hash and disk_a.sector_order is disk_b.sector_order:
+            return
+
+        if hashes_a is None:
+            hashes_a = SectorHashes(disk_a)
+        if hashes_b is None:
+            hashes_b = SectorHashes(disk_b)
+
+        differing = [idx for idx, (a, b) in enumerate(zip(hashes_a, hashes_b)) if a != b]
+        for idx in differing:
+            track, sector = divmod(idx, disklib.SECTORS_PER_TRACK)
+            self.differences.append(SectorDiff(
+                track, sector,
+                SectorOwner(disk_a, track, sector), SectorOwner(disk_b, track, sector),
+                bytearray(disk_a.SectorData(track, sector)),
+                bytearray(disk_b.SectorData(track, sector))
+            ))
+
+    def Render(self):
+        """Return a hex diff of all differing sectors as a string."""
+        out = cStringIO.StringIO()
+        out.write('%s vs %s: %d sectors differ\n' % (self.disk_a.name, self.disk_b.name, len(self.differences)))
+        for sector_diff in self.differences:
+            out.write('\n')
+            sector_diff.Render(out)
+        return out.getvalue()
+
+
+def main():
+    disks = []
+    for f in sys.argv[1:3]:
+        (b, order) = disklib.ReadImage(f, bytearray(open(f, 'rb').read()))
+        try:
+            img = dos33disk.Dos33Disk(f, b, sector_order=order)
+        except (disklib.IOError, AssertionError):
+            # Not a DOS 3.3 disk, so sectors can't be mapped to files
+            img = disklib.Disk(f, b, sector_order=order)
+        disks.append(img)
+
+    sys.stdout.write(DiskDiff(*disks).Render())
+
+if __name__ == "__main__":
+    main()
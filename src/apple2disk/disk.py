@@ -2,6 +2,8 @@ import container
 
 import bitstring
 import hashlib
+import os
+import struct
 import zlib
 
 SECTOR_SIZE = 256
@@ -10,26 +12,224 @@ SECTORS_PER_TRACK = 16
 TRACKS_PER_DISK = 35
 
 TRACK_SIZE = SECTORS_PER_TRACK * SECTOR_SIZE
+DISK_SIZE = TRACKS_PER_DISK * TRACK_SIZE
+
+# Physical sector number of each DOS 3.3 logical sector
+DOS_TO_PHYSICAL = [0x0, 0xd, 0xb, 0x9, 0x7, 0x5, 0x3, 0x1, 0xe, 0xc, 0xa, 0x8, 0x6, 0x4, 0x2, 0xf]
+# Physical sector number of each ProDOS logical sector (i.e. half-block)
+PRODOS_TO_PHYSICAL = [0x0, 0x2, 0x4, 0x6, 0x8, 0xa, 0xc, 0xe, 0x1, 0x3, 0x5, 0x7, 0x9, 0xb, 0xd, 0xf]
 
 class IOError(Exception):
     pass
 
+
+class SectorOrder(object):
+    def __init__(self, name, physical_sectors):
+        """Order in which sectors of each track are stored in a disk image.
+
+        Args:
+            name: human-readable name of the ordering (str)
+            physical_sectors: physical sector number stored at each position in the track (list of int)
+        """
+        self.name = name
+        self.physical_sectors = physical_sectors
+
+        # Position in the track of each DOS 3.3 and ProDOS logical sector
+        self.dos_sectors = [physical_sectors.index(p) for p in DOS_TO_PHYSICAL]
+        self.prodos_sectors = [physical_sectors.index(p) for p in PRODOS_TO_PHYSICAL]
+
+    def __str__(self):
+        return self.name
+
+DOS_ORDER = SectorOrder('DOS', DOS_TO_PHYSICAL)
+PRODOS_ORDER = SectorOrder('ProDOS', PRODOS_TO_PHYSICAL)
+PHYSICAL_ORDER = SectorOrder('Physical', range(SECTORS_PER_TRACK))
+
+SECTOR_ORDERS = [DOS_ORDER, PRODOS_ORDER, PHYSICAL_ORDER]
+
+# Sector order conventionally implied by each file extension
+EXTENSION_ORDERS = {
+    '.do': DOS_ORDER,
+    '.dsk': DOS_ORDER,
+    '.po': PRODOS_ORDER,
+}
+
+IMAGE_EXTENSIONS = ('.do', '.dsk', '.po', '.2mg')
+
+# 2MG image formats
+TWOMG_ORDERS = {
+    0: DOS_ORDER,
+    1: PRODOS_ORDER,
+    # 2 is nibble format, which is not supported
+}
+
+
+def Read2MG(data):
+    """Parse the header of a 2MG image.
+
+    Returns:
+        (image data without header as a zero-copy buffer, SectorOrder)
+    """
+    if len(data) < 64 or str(data[:4]) != '2IMG':
+        raise IOError('Not a 2MG image')
+
+    (header_size, image_format, data_offset, data_length) = struct.unpack(
+        '<8xH2xI8xII', str(data[:32]))
+
+    try:
+        order = TWOMG_ORDERS[image_format]
+    except KeyError:
+        raise IOError('Unsupported 2MG image format %d' % image_format)
+
+    if not data_length and image_format == 1:
+        # Some creators leave this empty for ProDOS-ordered images and only fill in the block count
+        (num_blocks,) = struct.unpack('<I', str(data[20:24]))
+        data_length = num_blocks * 512
+    if data_offset + data_length > len(data):
+        raise IOError('2MG image data at $%x length $%x exceeds file size $%x' % (
+            data_offset, data_length, len(data)))
+
+    return buffer(data, data_offset, data_length), order
+
+
+def _ImageSector(data, order, track, sector, prodos=False):
+    """Read a logical sector from an image in the given order, without validation."""
+    if prodos:
+        position = order.prodos_sectors[sector]
+    else:
+        position = order.dos_sectors[sector]
+    offset = track * TRACK_SIZE + position * SECTOR_SIZE
+    return bytearray(buffer(data, offset, SECTOR_SIZE))
+
+
+def _ScoreDos33(data, order):
+    """Score how much the VTOC and catalog look like DOS 3.3 when read in this order."""
+    vtoc = _ImageSector(data, order, 0x11, 0x0)
+    score = 0
+    score += vtoc[0x03] == 3
+    score += vtoc[0x27] == 122
+    score += vtoc[0x34] == TRACKS_PER_DISK
+    score += vtoc[0x35] == SECTORS_PER_TRACK
+    score += (vtoc[0x36], vtoc[0x37]) == (SECTOR_SIZE & 0xff, SECTOR_SIZE >> 8)
+
+    # The catalog chain is the best discriminator since it usually runs through every sector
+    # of the catalog track, while the VTOC and first catalog sector are the same in every order.
+    (track, sector) = (vtoc[0x01], vtoc[0x02])
+    seen = set()
+    track_sector_lists = []
+    while 0 < track < TRACKS_PER_DISK and sector < SECTORS_PER_TRACK and (track, sector) not in seen:
+        seen.add((track, sector))
+        score += 1
+        catalog = _ImageSector(data, order, track, sector)
+        (track, sector) = (catalog[0x01], catalog[0x02])
+
+        for offset in xrange(0x0b, SECTOR_SIZE - 34, 35):
+            if 0 < catalog[offset] < TRACKS_PER_DISK and catalog[offset + 1] < SECTORS_PER_TRACK:
+                track_sector_lists.append((catalog[offset], catalog[offset + 1]))
+
+    # First track/sector list of each file should start at sector offset 0 with a valid data sector
+    for (track, sector) in track_sector_lists[:16]:
+        ts_list = _ImageSector(data, order, track, sector)
+        score += (
+            ts_list[0x05] == 0 and ts_list[0x06] == 0 and
+            0 < ts_list[0x0c] < TRACKS_PER_DISK and ts_list[0x0d] < SECTORS_PER_TRACK
+        )
+
+    return score
+
+
+def _ScoreProDOS(data, order):
+    """Score how much the volume directory looks like ProDOS when read in this order."""
+    score = 0
+    expected_prev = 0
+    # Volume directory key block is block 2, usually followed by blocks 3-5
+    block = 2
+    seen = set()
+    while block and block < TRACKS_PER_DISK * SECTORS_PER_TRACK / 2 and block not in seen:
+        seen.add(block)
+        (track, half) = divmod(block, 8)
+        directory = _ImageSector(data, order, track, half * 2, prodos=True)
+        (prev_block, next_block) = struct.unpack('<HH', str(directory[0:4]))
+        if prev_block != expected_prev:
+            break
+        score += 1
+        if block == 2:
+            storage_type = directory[0x04] >> 4
+            name_length = directory[0x04] & 0xf
+            score += storage_type == 0xf
+            score += name_length > 0
+            score += directory[0x23] == 0x27
+            score += directory[0x24] == 0x0d
+        expected_prev = block
+        block = next_block
+
+    return score
+
+
+def DetectSectorOrder(data, default=DOS_ORDER):
+    """Guess the sector order of a 140K disk image by checking DOS 3.3 and ProDOS structures.
+
+    Only a handful of sectors are read for each candidate order.  The default is kept unless
+    another order scores strictly better.
+    """
+    if len(data) != DISK_SIZE:
+        return default
+
+    best_order = default
+    best_score = _ScoreDos33(data, default) + _ScoreProDOS(data, default)
+    for order in SECTOR_ORDERS:
+        if order is default:
+            continue
+        score = _ScoreDos33(data, order) + _ScoreProDOS(data, order)
+        if score > best_score:
+            best_order = order
+            best_score = score
+    return best_order
+
+
+def ReadImage(name, data):
+    """Prepare a disk image file for parsing, stripping any 2MG header and detecting the sector order.
+
+    Returns:
+        (image data, SectorOrder)
+    """
+    default = EXTENSION_ORDERS.get(os.path.splitext(name)[1].lower(), DOS_ORDER)
+    if str(data[:4]) == '2IMG':
+        (data, default) = Read2MG(data)
+    return data, DetectSectorOrder(data, default)
+
 class Disk(container.Container):
-    def __init__(self, name, data):
+    def __init__(self, name, data, preload=True, sector_order=None):
+        """
+        Args:
+            name: name of the disk image (str)
+            data: raw disk image (bytearray or buffer)
+            preload: if False, sectors are only read when first requested by ReadSector (bool)
+            sector_order: SectorOrder of data, detected with DetectSectorOrder if None
+        """
         super(Disk, self).__init__()
 
         self.name = name
         self.data = data
+        self.preload = preload
 
         # TODO: support larger disk sizes
-        assert len(data) == 140 * 1024
+        assert len(data) == DISK_SIZE
+
+        if sector_order is None:
+            sector_order = DetectSectorOrder(data)
+        self.sector_order = sector_order
 
         self.hash = hashlib.sha1(data).hexdigest()
 
+        # Number of anomalies kept for this disk, for anomaly.AnomalySink's per-disk limit
+        self.anomaly_count = 0
+
         self.sectors = {}
-        # Pre-load all sectors into map
-        for (track, sector) in self.EnumerateSectors():
-            self._ReadSector(track, sector)
+        if preload:
+            # Pre-load all sectors into map
+            for (track, sector) in self.EnumerateSectors():
+                self._ReadSector(track, sector)
 
         # Assign ownership of T0, S0 to boot1
         self.boot1 = Boot1.fromSector(self.ReadSector(0, 0))
@@ -37,10 +237,13 @@ class Disk(container.Container):
     @classmethod
     def Taste(cls, disk):
         # TODO: return a defined exception here
-        newdisk = cls(disk.name, disk.data)
+        newdisk = cls(disk.name, disk.data, sector_order=disk.sector_order)
         disk.AddChild(newdisk)
         return newdisk
 
+    def OwningDisk(self):
+        return self
+
     def SetSectorOwner(self, track, sector, owner):
         self.sectors[(track, sector)] = owner
 
@@ -49,12 +252,16 @@ class Disk(container.Container):
             for sector in xrange(SECTORS_PER_TRACK):
                 yield (track, sector)
 
-    def _ReadSector(self, track, sector):
-        offset = track * TRACK_SIZE + sector * SECTOR_SIZE
-        if sector >= SECTORS_PER_TRACK or offset > len(self.data):
+    def SectorData(self, track, sector):
+        """Return the contents of a DOS 3.3 logical sector as a zero-copy buffer."""
+        if track < 0 or track >= TRACKS_PER_DISK or sector < 0 or sector >= SECTORS_PER_TRACK:
             raise IOError("Track $%02x sector $%02x out of bounds" % (track, sector))
 
-        data = bitstring.BitString(self.data[offset:offset + SECTOR_SIZE])
+        offset = track * TRACK_SIZE + self.sector_order.dos_sectors[sector] * SECTOR_SIZE
+        return buffer(self.data, offset, SECTOR_SIZE)
+
+    def _ReadSector(self, track, sector):
+        data = bitstring.BitString(bytes=self.SectorData(track, sector))
 
         # This calls SetSectorOwner to register in self.sectors
         return Sector(self, track, sector, data)
@@ -64,7 +271,9 @@ class Disk(container.Container):
         try:
             return self.sectors[(track, sector)]
         except KeyError:
-            raise IOError("Track $%02x sector $%02x out of bounds" % (track, sector))
+            if self.preload:
+                raise IOError("Track $%02x sector $%02x out of bounds" % (track, sector))
+            return self._ReadSector(track, sector)
 
 
 class Sector(container.Container):
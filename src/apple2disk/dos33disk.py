@@ -50,28 +50,33 @@ class VTOCSector(disklib.Sector):
         assert max_track_sector_pairs == 122
 
         if tracks_per_disk != disklib.TRACKS_PER_DISK:
-            self.anomalies.append(
-                anomaly.Anomaly(
-                    self, anomaly.UNUSUAL, 'Disk has %d tracks > %d' % (
-                        tracks_per_disk, disklib.TRACKS_PER_DISK)
-                )
+            self.AddAnomaly(
+                anomaly.UNUSUAL, 'Disk has %d tracks > %d', tracks_per_disk, disklib.TRACKS_PER_DISK
             )
 
         self.catalog_track = catalog_track
         self.catalog_sector = catalog_sector
 
         if (catalog_track, catalog_sector) != (0x11, 0x0f):
-            self.anomalies.append(
-                anomaly.Anomaly(
-                    self, anomaly.UNUSUAL, 'Catalog begins in unusual place: T$%02X S$%02X' % (
-                        catalog_track, catalog_sector)
-                )
+            self.AddAnomaly(
+                anomaly.UNUSUAL, 'Catalog begins in unusual place: T$%02X S$%02X', catalog_track, catalog_sector
             )
 
         # TODO: why does DOS 3.3 sometimes display e.g. volume 254 when the VTOC says 178
         self.volume = volume
 
-        # Process freemap
+        self.tracks_per_disk = tracks_per_disk
+        self.freemap = freemap
+
+        # Claiming free sectors touches most of the disk, so skip it when only reading part of it
+        if disk.preload:
+            self.ProcessFreemap()
+
+    def ProcessFreemap(self):
+        """Claim the sectors marked free in the freemap as FreeSectors."""
+        freemap = self.freemap
+        tracks_per_disk = self.tracks_per_disk
+
         offset = 0
         track = 0
         while offset < len(freemap):
@@ -84,20 +89,16 @@ class VTOCSector(disklib.Sector):
 
                 if free:
                     if track == 0:
-                        self.anomalies.append(
-                            anomaly.Anomaly(
-                                self, anomaly.CORRUPTION,
-                                'Freemap claims free sector in track 0: T$%02X S$%02X (cannot be allocated in DOS '
-                                '3.3)' % (track, sector)
-                            )
+                        self.AddAnomaly(
+                            anomaly.CORRUPTION,
+                            'Freemap claims free sector in track 0: T$%02X S$%02X (cannot be allocated in DOS '
+                            '3.3)', track, sector
                         )
                         continue
                     if track >= tracks_per_disk:
-                        self.anomalies.append(
-                            anomaly.Anomaly(
-                                self, anomaly.CORRUPTION,
-                                'Freemap claims free sector beyond last track: T$%02X S$%02X' % (track, sector)
-                            )
+                        self.AddAnomaly(
+                            anomaly.CORRUPTION,
+                            'Freemap claims free sector beyond last track: T$%02X S$%02X', track, sector
                         )
                         continue
 
@@ -106,11 +107,7 @@ class VTOCSector(disklib.Sector):
                     # TODO: we haven't yet parsed the catalog so this won't yet have claimed the sectors.  We
                     # need to validate the freemap once everything else is done.
                     if type(old_sector) != disklib.Sector:
-                        self.anomalies.append(
-                            anomaly.Anomaly(
-                                self, anomaly.CORRUPTION, 'VTOC claims used sector is free: %s' % old_sector
-                            )
-                        )
+                        self.AddAnomaly(anomaly.CORRUPTION, 'VTOC claims used sector is free: %s', old_sector)
 
                     FreeSector.fromSector(old_sector)
                 # TODO: also handle sectors that are claimed to be used but don't end up getting referenced by anything
@@ -215,10 +212,47 @@ class Dos33Disk(disklib.Disk):
 
         # Maps stripped filename to File() object
         self.files = {}
-        for catalog_entry in self.catalog.itervalues():
-            newfile = self.ReadCatalogEntry(catalog_entry)
-            # TODO: last character has special meaning for deleted files and may legitimately be whitespace.  Could collide with a non-deleted file of the same stripped name
-            self.files[catalog_entry.FileName().rstrip()] = newfile
+
+        # List of RecoveredFile, once carve.CarveFiles() has been run
+        self.recovered_files = None
+        if self.preload:
+            for catalog_entry in self.catalog.itervalues():
+                self.ReadFile(catalog_entry.FileName())
+
+    @classmethod
+    def OpenCatalog(cls, name, data, filename=None, sector_order=None):
+        """Open a disk reading only the VTOC and catalog, and optionally a single file.
+
+        This skips pre-loading every sector and assembling every file, so only the
+        sectors that are needed are read.
+
+        Args:
+            name: name of the disk image (str)
+            data: raw disk image (bytearray)
+            filename: if set, also read the file with this name into self.files (str)
+            sector_order: disk.SectorOrder of data, e.g. from disk.ReadImage; detected if None
+        """
+        newdisk = cls(name, data, preload=False, sector_order=sector_order)
+        if filename is not None:
+            newdisk.ReadFile(filename)
+        return newdisk
+
+    def ReadFile(self, filename):
+        """Read the named file from the disk if it hasn't been already.
+
+        Raises:
+            KeyError: if the file is not in the catalog
+        """
+        filename = filename.rstrip()
+        try:
+            return self.files[filename]
+        except KeyError:
+            pass
+
+        newfile = self.ReadCatalogEntry(self.catalog[filename])
+        # TODO: last character has special meaning for deleted files and may legitimately be whitespace.  Could collide with a non-deleted file of the same stripped name
+        self.files[filename] = newfile
+        return newfile
 
     def _ReadVTOC(self):
         return VTOCSector.fromSector(self.ReadSector(0x11, 0x0))
@@ -257,8 +291,8 @@ class Dos33Disk(disklib.Disk):
                 break
             if next_track == 0xff:
                 # Deleted file
-                # TODO: add sector type for this.  What to do about sectors claimed by this file that are in use by another file?  May discover this before or after this entry
-                print "Found deleted file %s" % entry.FileName()
+                # Its contents can be recovered with carve.CarveFiles()
+                self.AddAnomaly(anomaly.INFO, 'Found deleted file %s', entry.FileName())
                 break
             try:
                 fs = FileMetadataSector.fromSector(self.ReadSector(next_track, next_sector), entry.FileName())
@@ -267,11 +301,8 @@ class Dos33Disk(disklib.Disk):
                 sector_list[fs.sector_offset:fs.sector_offset + num_sectors] = fs.data_track_sectors
             except disklib.IOError, e:
                 # TODO: add a flag indicating truncated file?
-                self.anomalies.append(
-                    anomaly.Anomaly(
-                        self, anomaly.CORRUPTION, 'File metadata sector out of bounds for file %s: %s' % (
-                            entry.FileName(), e)
-                    )
+                self.AddAnomaly(
+                    anomaly.CORRUPTION, 'File metadata sector out of bounds for file %s: %s', entry.FileName(), e
                 )
                 (next_track, next_sector) = (None, None)
 
@@ -289,16 +320,13 @@ class Dos33Disk(disklib.Disk):
             try:
                 fds = FileDataSector.fromSector(self.ReadSector(t, s), entry.FileName())
             except disklib.IOError, e:
-                self.anomalies.append(
-                    anomaly.Anomaly(
-                        self, anomaly.CORRUPTION, 'File data sector out of bounds for file %s: %s' % (
-                            entry.FileName(), e)
-                    )
+                self.AddAnomaly(
+                    anomaly.CORRUPTION, 'File data sector out of bounds for file %s: %s', entry.FileName(), e
                 )
                 continue
             contents.append(fds.data)
 
-        newfile = File(entry, contents)
+        newfile = File(entry, contents, disk=self)
         self.AddChild(newfile)
         return newfile
 
@@ -331,7 +359,13 @@ class CatalogEntry(container.Container):
         self.locked = bool(file_type & 0x80)
         self.file_name = file_name
         self.length = length
-        # TODO: handle deleted files (track = 0xff, original track in file_name[0x20])
+
+        # Deleting a file sets the track to 0xff and moves the original track to the last byte of the name
+        self.deleted = track == 0xff
+        if self.deleted:
+            self.original_track = ord(file_name[-1])
+        else:
+            self.original_track = track
 
     def FileName(self):
         return '%s' % ''.join([chr(ord(b) & 0x7f) for b in self.file_name])
@@ -344,8 +378,8 @@ class CatalogEntry(container.Container):
 
 
 class File(container.Container):
-    def __init__(self, catalog_entry, contents):
-        super(File, self).__init__()
+    def __init__(self, catalog_entry, contents, disk=None):
+        super(File, self).__init__(disk=disk)
 
         self.catalog_entry = catalog_entry
 
@@ -355,14 +389,10 @@ class File(container.Container):
         parser = catalog_entry.file_type.parser
         if parser:
             try:
-                self.parsed_contents = parser(catalog_entry.FileName(), contents)
+                self.parsed_contents = parser(catalog_entry.FileName(), contents, disk=disk)
                 self.AddChild(self.parsed_contents)
             except Exception, e:
-                self.anomalies.append(
-                    anomaly.Anomaly(
-                        self, anomaly.CORRUPTION, 'Failed to parse file %s: %s' % (self.catalog_entry, e)
-                    )
-                )
+                self.AddAnomaly(anomaly.CORRUPTION, 'Failed to parse file %s: %s', self.catalog_entry, e)
 
     def __str__(self):
         return 'File(%s)' % self.catalog_entry.FileName()
\ No newline at end of file
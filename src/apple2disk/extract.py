@@ -0,0 +1,237 @@
+import disk as disklib
+import dos33disk
+
+import cStringIO
+import errno
+import hashlib
+import os
+import sys
+import tarfile
+import time
+
+# Size of write buffers for output files and tar streams
+BUFFER_SIZE = 1024 * 1024
+
+# Characters that can't appear in an output path component
+UNSAFE_CHARS = '/\\\0'
+
+
+def SafeName(name):
+    """Convert a DOS 3.3 filename into something usable as a path component."""
+    name = name.rstrip()
+    safe = []
+    for c in name:
+        if c in UNSAFE_CHARS or not (0x20 <= ord(c) < 0x7f):
+            safe.append('_')
+        else:
+            safe.append(c)
+    safe = ''.join(safe)
+    if safe in ('', '.', '..'):
+        safe = '_' + safe
+    return safe
+
+
+def DecodeText(data):
+    """Decode the contents of a DOS 3.3 text file to a str.
+
+    Text files are stored with the high bit set and CR line endings, and are
+    terminated by the first zero byte.
+    """
+    end = data.find('\0')
+    if end != -1:
+        data = data[:end]
+    return ''.join(chr(ord(b) & 0x7f) for b in data).replace('\r', '\n')
+
+
+class DirectorySink(object):
+    """Writes extracted files into a directory tree."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def Write(self, path, data):
+        full_path = os.path.join(self.root, path)
+        try:
+            os.makedirs(os.path.dirname(full_path))
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+        with open(full_path, 'wb', BUFFER_SIZE) as f:
+            f.write(data)
+
+    def Link(self, path, target):
+        """Record path as a duplicate of the previously written target."""
+        full_path = os.path.join(self.root, path)
+        full_target = os.path.join(self.root, target)
+        try:
+            os.makedirs(os.path.dirname(full_path))
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+        try:
+            os.link(full_target, full_path)
+        except (AttributeError, OSError):
+            # No hard link support, fall back to writing another copy
+            with open(full_target, 'rb') as src:
+                self.Write(path, src.read())
+
+    def Close(self):
+        pass
+
+
+class TarSink(object):
+    """Streams extracted files into a tar archive."""
+
+    def __init__(self, fileobj):
+        self.tar = tarfile.open(fileobj=fileobj, mode='w|', bufsize=BUFFER_SIZE)
+        self.mtime = time.time()
+
+    def _TarInfo(self, path):
+        info = tarfile.TarInfo(path)
+        info.mtime = self.mtime
+        info.mode = 0644
+        return info
+
+    def Write(self, path, data):
+        info = self._TarInfo(path)
+        info.size = len(data)
+        self.tar.addfile(info, cStringIO.StringIO(data))
+
+    def Link(self, path, target):
+        """Record path as a duplicate of the previously written target."""
+        info = self._TarInfo(path)
+        info.type = tarfile.LNKTYPE
+        info.linkname = target
+        self.tar.addfile(info)
+
+    def Close(self):
+        self.tar.close()
+
+
+class Extractor(object):
+    """Bulk extraction of files from DOS 3.3 disks.
+
+    Content that has already been written is deduplicated by hash, and later
+    copies are recorded as links to the first one.
+    """
+
+    def __init__(self, sink, decode=False):
+        """
+        Args:
+            sink: DirectorySink or TarSink to write files to
+            decode: also write decoded AppleSoft listings and text files (bool)
+        """
+        self.sink = sink
+        self.decode = decode
+
+        # Maps sha1 hex digest of written content to its output path
+        self.written = {}
+        # Output paths and disk directories already used
+        self.paths = set()
+        self.disk_dirs = set()
+
+        self.files_written = 0
+        self.files_deduplicated = 0
+        self.bytes_written = 0
+
+    @staticmethod
+    def _UniquePath(path, used):
+        unique_path = path
+        suffix = 1
+        while unique_path in used:
+            unique_path = '%s.%d' % (path, suffix)
+            suffix += 1
+        used.add(unique_path)
+        return unique_path
+
+    def _Write(self, path, data):
+        path = self._UniquePath(path, self.paths)
+        content_hash = hashlib.sha1(data).hexdigest()
+        try:
+            target = self.written[content_hash]
+        except KeyError:
+            self.sink.Write(path, data)
+            self.written[content_hash] = path
+            self.files_written += 1
+            self.bytes_written += len(data)
+        else:
+            self.sink.Link(path, target)
+            self.files_deduplicated += 1
+        return path
+
+    def AddDisk(self, disk):
+        # type: (dos33disk.Dos33Disk) -> None
+        # Disk names may be relative paths, so keep their directory structure
+        disk_dir = '/'.join(SafeName(component) for component in disk.name.split(os.sep))
+        # Images with the same name each get their own directory
+        disk_dir = self._UniquePath(disk_dir, self.disk_dirs)
+        for filename in disk.filenames:
+            f = disk.files[filename]
+            if f.catalog_entry.deleted:
+                # Deleted file, there are no contents to extract
+                continue
+
+            path = '%s/%s' % (disk_dir, SafeName(filename))
+            data = f.contents.tobytes()
+            self._Write(path, data)
+
+            if not self.decode:
+                continue
+
+            file_type = f.catalog_entry.file_type.short_type
+            if f.parsed_contents and file_type == 'A':
+                self._Write(path + '.bas', f.parsed_contents.List() + '\n')
+            elif file_type == 'T':
+                self._Write(path + '.txt', DecodeText(data))
+
+    def AddDisks(self, disks):
+        for disk in disks:
+            self.AddDisk(disk)
+
+    def Close(self):
+        self.sink.Close()
+
+
+def main():
+    if len(sys.argv) < 3:
+        print >> sys.stderr, 'Usage: %s <image directory> <output directory or .tar file> [--decode]' % sys.argv[0]
+        sys.exit(1)
+
+    output = sys.argv[2]
+    decode = '--decode' in sys.argv[3:]
+    if output.lower().endswith('.tar'):
+        outfile = open(output, 'wb')
+        sink = TarSink(outfile)
+    else:
+        outfile = None
+        sink = DirectorySink(output)
+
+    extractor = Extractor(sink, decode=decode)
+    for root, dirs, files in os.walk(sys.argv[1]):
+        for f in sorted(files):
+            if not f.lower().endswith(disklib.IMAGE_EXTENSIONS):
+                continue
+
+            path = os.path.join(root, f)
+            # Name disks by their path within the collection so that images in different
+            # directories with the same filename don't collide
+            name = os.path.relpath(path, sys.argv[1])
+            try:
+                (b, order) = disklib.ReadImage(name, bytearray(open(path, 'rb').read()))
+                img = dos33disk.Dos33Disk(name, b, sector_order=order)
+            except disklib.IOError:
+                continue
+            except AssertionError:
+                continue
+
+            extractor.AddDisk(img)
+
+    extractor.Close()
+    if outfile:
+        outfile.close()
+
+    print '%d files written (%d bytes), %d duplicates' % (
+        extractor.files_written, extractor.bytes_written, extractor.files_deduplicated)
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import anomaly
+import carve
 import disk
 import dos33disk
 import os
@@ -7,15 +9,15 @@ def main():
     disks = {}
     for root, dirs, files in os.walk(sys.argv[1]):
         for f in files:
-            if not f.lower().endswith('.dsk') and not f.lower().endswith('.do'):
+            if not f.lower().endswith(disk.IMAGE_EXTENSIONS):
                 continue
 
             print f
 
-            b = bytearray(open(os.path.join(root, f), 'r').read())
             try:
-                img = disk.Disk(f, b)
-            except IOError:
+                (b, order) = disk.ReadImage(f, bytearray(open(os.path.join(root, f), 'rb').read()))
+                img = disk.Disk(f, b, sector_order=order)
+            except disk.IOError:
                 continue
             except AssertionError:
                 continue
@@ -23,7 +25,7 @@ def main():
             # See if this is a DOS 3.3 disk
             try:
                 img = dos33disk.Dos33Disk.Taste(img)
-                print "%s is a DOS 3.3 disk, volume %d" % (f, img.volume)
+                print "%s is a DOS 3.3 disk (%s order), volume %d" % (f, img.sector_order, img.volume)
 
                 for fn in img.filenames:
                     f = img.files[fn]
@@ -32,6 +34,9 @@ def main():
                     if f.parsed_contents:
                         print f.parsed_contents
 
+                for recovered in carve.CarveFiles(img):
+                    print recovered
+
             except IOError:
                 pass
             except AssertionError:
@@ -43,6 +48,9 @@ def main():
                 print data
 
 
+    for line in anomaly.sink.Summary():
+        print line
+
     # Group disks by hash of boot1 sector
     boot1_hashes = {}
     for f, d in disks.iteritems():
@@ -2,16 +2,32 @@ import string
 
 PRINTABLE = set(string.letters + string.digits + string.punctuation + ' ')
 
+# Number of bytes shown on each line of a hex dump
+BYTES_PER_LINE = 8
+
+
+def FormatHexBytes(data):
+    """Format a sequence of bytes as space-separated hex."""
+    return ' '.join('%02x' % b for b in bytearray(data))
+
+
+def FormatPrintable(data):
+    """Format a sequence of bytes as printable characters, with '.' for the rest."""
+    return ''.join(c if c in PRINTABLE else '.' for c in str(bytearray(data)))
+
+
+def FormatHexLine(offset, data):
+    hex_bytes = FormatHexBytes(data).ljust(BYTES_PER_LINE * 3 - 1)
+    return '$%02x:   %s     %s' % (offset, hex_bytes, FormatPrintable(data))
+
+
+def FormatHexDump(data):
+    """Format data as a hex dump, returned as a string."""
+    return '\n'.join(
+        FormatHexLine(offset, data[offset:offset + BYTES_PER_LINE])
+        for offset in xrange(0, len(data), BYTES_PER_LINE)
+    )
+
+
 def HexDump(data):
-    line = []
-    for idx, b in enumerate(data):
-        if idx % 8 == 0:
-            print '$%02x:  ' % idx,
-        print "%02x" % ord(b),
-        if b in PRINTABLE:
-            line.append(b)
-        else:
-            line.append('.')
-        if (idx + 1) % 8 == 0:
-            print "    %s" % ''.join(line)
-            line = []
+    print FormatHexDump(data)